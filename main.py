@@ -2,7 +2,12 @@ import csv
 import locale
 import os
 from argparse import ArgumentParser
-from typing import Callable, TypeVar, TypedDict, cast
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import cache, lru_cache
+from operator import attrgetter
+from typing import Callable, Sequence, TypeVar, TypedDict, cast
 from datetime import date, time, datetime
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -16,7 +21,8 @@ from reportlab.platypus import (
 )
 
 
-class EventBase(TypedDict):
+@dataclass(slots=True)
+class EventBase:
     name: str
     date: date
     start_time: time
@@ -29,24 +35,26 @@ class Person(TypedDict):
     group: str
 
 
+@dataclass(slots=True)
 class Event(EventBase):
     people: list[Person]
 
 
+@dataclass(slots=True)
 class EventPersonal(EventBase):
     group: str
 
 
 class PersonalSchedule(TypedDict):
     person: str
-    events: tuple[EventPersonal, ...]
+    events: list[EventPersonal]
 
 
-type Events = dict[tuple[str, date, time, time, str], Event]
+type PeopleByEvent = defaultdict[tuple[str, date, time, time, str], list[Person]]
 
 type EventsByDate = dict[str, list[EventBase]]
 
-type SchedulesByPerson = dict[str, list[EventPersonal]]
+type SchedulesByPerson = defaultdict[str, list[EventPersonal]]
 
 type EventRow = tuple[str | Paragraph, ...]
 
@@ -55,6 +63,8 @@ type PDFContent = list[Flowable]
 
 Schedule = TypeVar("Schedule", bound=EventBase)
 
+LOCALE = "fi_FI.UTF-8"
+
 DATE_FORMAT = "%d/%m/%Y"
 
 TIME_FORMAT = "%H.%M"
@@ -63,8 +73,12 @@ PAGE_MARGIN = 30
 
 FONT_SIZE = 8
 
+READ_BUFFER_SIZE = 1 << 20
+
+event_sort_key = attrgetter("date", "start_time")
 styles = getSampleStyleSheet()
 spacer = Spacer(1, 12)
+title_style = styles["Title"]
 table_style = TableStyle(
     (
         ("ALIGN", (0, 0), (-1, -1), "LEFT"),
@@ -82,171 +96,137 @@ date_style = ParagraphStyle(
     parent=styles["Heading2"],
     keepWithNext=True,
 )
+table_cell_style = ParagraphStyle(
+    name="TableCell",
+    parent=styles["Normal"],
+    fontSize=FONT_SIZE,
+)
 
 
+@lru_cache(maxsize=4096)
 def get_paragraph(text: str) -> Paragraph:
-    return Paragraph(
-        text,
-        ParagraphStyle(
-            name="TableCell",
-            parent=styles["Normal"],
-            fontSize=FONT_SIZE,
-        ),
+    return Paragraph(text, table_cell_style)
+
+
+def is_zero_padded(date: str) -> bool:
+    return (
+        len(date) == 16
+        and date[2] == date[5] == "/"
+        and date[10] == " "
+        and date[13] == "."
     )
 
 
+@cache
 def get_datetime(date: str) -> datetime:
-    return datetime.strptime(date, f"{DATE_FORMAT} {TIME_FORMAT}")
+    # Zero-padded "dd/mm/YYYY HH.MM" is sliced directly as strptime is slow
+    if not is_zero_padded(date):
+        return datetime.strptime(date, f"{DATE_FORMAT} {TIME_FORMAT}")
+
+    return datetime(
+        int(date[6:10]),
+        int(date[3:5]),
+        int(date[0:2]),
+        int(date[11:13]),
+        int(date[14:16]),
+    )
+
+
+@cache
+def get_time_only(date: str) -> time:
+    # Only the "HH.MM" tail of a zero-padded get_datetime string
+    if not is_zero_padded(date):
+        return get_datetime(date).time()
+
+    return time(int(date[11:13]), int(date[14:16]))
 
 
 def get_events_sorted_by_time(
     events: list[Schedule],
 ) -> list[Schedule]:
-    return sorted(
-        events,
-        key=lambda event: (event["date"], event["start_time"]),
-    )
-
-
-def add_event(
-    event_name: str,
-    events_by_name: Events,
-    person: str,
-    group: str,
-    event_date: date,
-    start_time: time,
-    end_time: time,
-    place: str,
-):
-    key = (event_name, event_date, start_time, end_time, place)
-    person_and_group: Person = {"name": person, "group": group}
-
-    if key not in events_by_name:
-        events_by_name[key] = {
-            "name": event_name,
-            "date": event_date,
-            "start_time": start_time,
-            "end_time": end_time,
-            "place": place,
-            "people": [person_and_group],
-        }
-        return
-
-    existing_event = events_by_name[key]
-
-    existing_event["people"].append(person_and_group)
-
-
-def add_personal_event(
-    event_name: str,
-    schedules_by_person: SchedulesByPerson,
-    person: str,
-    group: str,
-    event_date: date,
-    start_time: time,
-    end_time: time,
-    place: str,
-):
-    personal_event: EventPersonal = {
-        "name": event_name,
-        "date": event_date,
-        "start_time": start_time,
-        "end_time": end_time,
-        "place": place,
-        "group": group,
-    }
-
-    if person in schedules_by_person:
-        schedules_by_person[person].append(personal_event)
-    else:
-        schedules_by_person[person] = [personal_event]
+    return sorted(events, key=event_sort_key)
 
 
 def get_schedules(
     input_file: str,
-) -> tuple[tuple[Event, ...], tuple[PersonalSchedule, ...]]:
-    events_by_name: Events = {}
-    schedules_by_person: SchedulesByPerson = {}
-
-    with open(input_file, newline="", encoding="utf-8") as csvfile:
-        reader = csv.DictReader(csvfile)
-
-        if reader.fieldnames:
-            reader.fieldnames = [
-                header.lstrip("\ufeff") for header in reader.fieldnames
-            ]
+) -> tuple[list[Event], list[PersonalSchedule]]:
+    people_by_event: PeopleByEvent = defaultdict(list)
+    schedules_by_person: SchedulesByPerson = defaultdict(list)
+
+    with open(
+        input_file, newline="", encoding="utf-8-sig", buffering=READ_BUFFER_SIZE
+    ) as csvfile:
+        reader = csv.reader(csvfile)
+        headers = next(reader, None)
+
+        if headers is None:
+            return [], []
+
+        start_time_index = headers.index("Start time")
+        end_time_index = headers.index("End time")
+        place_index = headers.index("Place")
+        person_index = headers.index("Person")
+        group_index = headers.index("Group")
+        event_index = headers.index("Event")
 
         for row in reader:
-            event_datetime = get_datetime(row["Start time"])
+            # Blank lines parse to [], which DictReader used to skip
+            if not row:
+                continue
+
+            event_datetime = get_datetime(row[start_time_index])
             event_date = event_datetime.date()
             start_time = event_datetime.time()
-            end_time = get_datetime(row["End time"]).time()
-            place = row["Place"]
-            person = row["Person"]
-            group = row["Group"]
-            event_name = row["Event"]
-
-            add_event(
-                event_name,
-                events_by_name,
-                person,
-                group,
-                event_date,
-                start_time,
-                end_time,
-                place,
-            )
-            add_personal_event(
-                event_name,
-                schedules_by_person,
-                person,
-                group,
-                event_date,
-                start_time,
-                end_time,
-                place,
+            end_time = get_time_only(row[end_time_index])
+            place = row[place_index]
+            person = row[person_index]
+            group = row[group_index]
+            event_name = row[event_index]
+
+            key = (event_name, event_date, start_time, end_time, place)
+            people_by_event[key].append({"name": person, "group": group})
+
+            schedules_by_person[person].append(
+                EventPersonal(
+                    event_name, event_date, start_time, end_time, place, group
+                )
             )
 
     return (
-        tuple(events_by_name.values()),
-        tuple(
-            {
-                "person": person,
-                "events": tuple(get_events_sorted_by_time(events)),
-            }
+        [Event(*key, people) for key, people in people_by_event.items()],
+        [
+            {"person": person, "events": get_events_sorted_by_time(events)}
             for person, events in schedules_by_person.items()
-        ),
+        ],
     )
 
 
+@cache
 def get_date(date: date) -> str:
     return date.strftime(DATE_FORMAT)
 
 
+@cache
 def get_time(time: time) -> str:
     return time.strftime(TIME_FORMAT)
 
 
-def get_events_by_date(events: tuple[EventBase, ...]) -> EventsByDate:
-    events_by_date: EventsByDate = {}
+def get_events_by_date(events: Sequence[EventBase]) -> EventsByDate:
+    events_by_date: EventsByDate = defaultdict(list)
 
     for event in events:
-        date = event["date"]
+        date = event.date
         date_str = f"{date.strftime('%A')} {get_date(date)}".capitalize()
-
-        if date_str not in events_by_date:
-            events_by_date[date_str] = []
-
         events_by_date[date_str].append(event)
 
     for date_str, events_grouped in events_by_date.items():
         events_by_date[date_str] = get_events_sorted_by_time(events_grouped)
 
-    return events_by_date
+    return dict(events_by_date)
 
 
 def get_event_duration(event: EventBase) -> str:
-    return f"{get_time(event['start_time'])} - {get_time(event['end_time'])}"
+    return f"{get_time(event.start_time)} - {get_time(event.end_time)}"
 
 
 def build_schedule_pdf(
@@ -255,14 +235,15 @@ def build_schedule_pdf(
     get_event: Callable[[EventBase], tuple[EventRow, ...]],
     col_widths: tuple[int, ...],
 ) -> PDFContent:
-    elements: PDFContent = [Paragraph(title, styles["Title"]), spacer]
+    elements: PDFContent = [Paragraph(title, title_style), spacer]
 
     for date_str, events_on_same_date in events_by_date.items():
         elements.append(Paragraph(date_str, date_style))
 
-        table_data = tuple(
-            row for event in events_on_same_date for row in get_event(event)
-        )
+        table_data: list[EventRow] = []
+
+        for event in events_on_same_date:
+            table_data.extend(get_event(event))
 
         if not table_data:
             continue
@@ -282,8 +263,8 @@ def get_person_in_event(
 ) -> EventRow:
     if index == 0:
         duration = get_event_duration(event)
-        name = event["name"]
-        place = event["place"]
+        name = event.name
+        place = event.place
     else:
         duration = ""
         name = ""
@@ -298,14 +279,14 @@ def get_person_in_event(
     )
 
 
-def build_overall_schedule_pdf(events: tuple[Event, ...]) -> PDFContent:
+def build_overall_schedule_pdf(events: list[Event]) -> PDFContent:
     def get_event(event: EventBase) -> tuple[EventRow, ...]:
         event = cast(Event, event)
 
         # Include an empty row for spacing
         return tuple(
             get_person_in_event(i, event, person)
-            for i, person in enumerate(event["people"])
+            for i, person in enumerate(event.people)
         ) + ((),)
 
     return build_schedule_pdf(
@@ -317,7 +298,7 @@ def build_overall_schedule_pdf(events: tuple[Event, ...]) -> PDFContent:
 
 
 def build_personal_schedule_pdf(
-    person_name: str, events: tuple[EventPersonal, ...]
+    person_name: str, events: list[EventPersonal]
 ) -> PDFContent:
     def get_event(event: EventBase) -> tuple[EventRow, ...]:
         event = cast(EventPersonal, event)
@@ -325,9 +306,9 @@ def build_personal_schedule_pdf(
         return (
             (
                 get_event_duration(event),
-                get_paragraph(event["name"]),
-                get_paragraph(event["group"]),
-                event["place"],
+                get_paragraph(event.name),
+                get_paragraph(event.group),
+                event.place,
             ),
         )
 
@@ -345,8 +326,17 @@ def create_pdf(elements: PDFContent, output_path: str):
     ).build(elements)
 
 
+def create_personal_schedule_pdf(schedule: PersonalSchedule, output_folder: str):
+    person = schedule["person"]
+
+    create_pdf(
+        build_personal_schedule_pdf(person, schedule["events"]),
+        os.path.join(output_folder, f"{person}.pdf"),
+    )
+
+
 if __name__ == "__main__":
-    locale.setlocale(locale.LC_ALL, "fi_FI.UTF-8")
+    locale.setlocale(locale.LC_ALL, LOCALE)
 
     parser = ArgumentParser()
 
@@ -358,15 +348,20 @@ if __name__ == "__main__":
 
     os.makedirs(args.output_folder, exist_ok=True)
 
-    create_pdf(
-        build_overall_schedule_pdf(all_events),
-        os.path.join(args.output_folder, "schedule.pdf"),
-    )
-
-    for schedule in personal_schedules:
-        person = schedule["person"]
+    # Personal schedules are independent, so render them in worker processes
+    # while the overall schedule is built here
+    with ProcessPoolExecutor(
+        initializer=locale.setlocale, initargs=(locale.LC_ALL, LOCALE)
+    ) as executor:
+        futures = [
+            executor.submit(create_personal_schedule_pdf, schedule, args.output_folder)
+            for schedule in personal_schedules
+        ]
 
         create_pdf(
-            build_personal_schedule_pdf(person, schedule["events"]),
-            os.path.join(args.output_folder, f"{person}.pdf"),
+            build_overall_schedule_pdf(all_events),
+            os.path.join(args.output_folder, "schedule.pdf"),
         )
+
+        for future in futures:
+            future.result()